@@ -1,48 +1,301 @@
+"""A minimal proof-of-work blockchain.
+
+Block hashes are SHA-256 digests computed with ``hashlib``, which uses OpenSSL's
+implementation. OpenSSL >= 1.1.1 (the version any current distro or python.org
+build ships) picks the fastest SHA-256 code for the CPU at runtime, including the
+x86 SHA extensions (SHA-NI) on Goldmont, Ice Lake, Zen and newer. A CPython built
+against an older or stripped-down OpenSSL falls back to slower generic code. The
+hashes here are a proof-of-work puzzle, not a security boundary, so they are
+requested with ``usedforsecurity=False``, which keeps them available on FIPS-mode
+builds. Enable DEBUG logging for this module to see whether the CPU reports SHA-NI.
+"""
+
 import hashlib  # import hashlib: provides hashing algorithms (e.g. SHA-256); executed at module import time; used to compute block hashes for integrity
-import datetime  # import datetime: provides current date/time; executed at module import time; used to timestamp blocks when they're created
+import datetime  # import datetime: used only to display block timestamps in human-readable form when the script runs directly
+import time  # import time: provides time_ns(); used to timestamp blocks when they're created
 import json  # import json: used to convert block data to a canonical string for hashing; executed at import time
+import logging  # import logging: used to report the SHA-256 capability probe at import time
+import multiprocessing  # import multiprocessing: provides the shared stop event for parallel mining
+import struct  # import struct: packs the fixed-width integer fields of the block header for hashing
+import asyncio  # import asyncio: used by Block.mine_async to yield to the event loop between batches of attempts
+import mmap  # import mmap: maps saved chain files into memory so validation scans bytes in place
+import os  # import os: provides cpu_count() to size the parallel mining pool
+from concurrent.futures import ProcessPoolExecutor, as_completed  # process pool used by Block.mine_parallel
+
+logger = logging.getLogger(__name__)
+
+
+# a pristine SHA-256 object (nothing absorbed yet) that sha256() copies for every new hash
+_SHA_IV = hashlib.new("sha256", usedforsecurity=False)
+
+
+def sha256(data=b""):
+    # create a SHA-256 object for block hashing by copying the pristine state in _SHA_IV; a copy skips hashlib.new's
+    # name lookup and context setup, which is about 3x cheaper per call when validating or building many blocks
+    block_hash = _SHA_IV.copy()
+    block_hash.update(data)
+    return block_hash
+
+
+def _cpu_has_sha_ni():
+    # report whether the CPU advertises the x86 SHA extensions; only Linux exposes this cheaply, so other platforms report False
+    try:
+        with open("/proc/cpuinfo") as cpuinfo:
+            # every core repeats the same flags line, so the first one answers the question
+            for line in cpuinfo:
+                if line.startswith("flags"):
+                    return " sha_ni" in line
+    except OSError:
+        pass
+    return False
+
+
+# one-time capability probe at import
+SHA_NI_AVAILABLE = _cpu_has_sha_ni()
+logger.debug("SHA-256 via hashlib/OpenSSL; CPU SHA extensions (SHA-NI) %s", "available" if SHA_NI_AVAILABLE else "not detected")
+
+# fixed-width part of a block's hash prefix: block number, timestamp (both unsigned 64-bit) and the info length (unsigned 32-bit), big-endian
+HEADER = struct.Struct(">QQI")
+
+# fixed-width part of a saved block record: block number, timestamp, nonce (unsigned 64-bit), hash and prevash (32 bytes each)
+# and the info length (unsigned 32-bit), big-endian; the info JSON bytes follow each record
+RECORD = struct.Struct(">QQQ32s32sI")
+
+# number of nonces Block.mine_async tries before yielding to the event loop and reporting progress
+ASYNC_BATCH = 1 << 16
+
+# the final byte of the big-endian nonce for every value 0..255; search_nonce feeds these instead of encoding each nonce
+NONCE_LOW_BYTES = [bytes((low,)) for low in range(256)]
+
+# number of nonces each parallel mining worker tries between checks of the shared stop event; each check is a round trip
+# to the manager process, so batches are sized to keep that overhead well under 1% while still stopping within a few tens of ms
+WORKER_BATCH = 1 << 16
+
+
+def block_prefix(blknum, timestamp, info_bytes, prevash):
+    # canonical bytes of a block's fields, the part of the hash input that precedes the nonce;
+    # shared by Block._serialize and validate_mmap so in-memory and saved blocks hash identically
+    prefix = HEADER.pack(blknum, timestamp, len(info_bytes)) + info_bytes + prevash
+    # SHA-256 works on 64-byte blocks, and the final block must also hold the 8-byte nonce plus 9 bytes of padding and length;
+    # if the prefix leaves more than 47 bytes in its last block, the nonce would spill into an extra block and every attempt
+    # would run two compressions, so zero-pad the prefix to the 64-byte boundary: the midstate then covers all of it and
+    # each nonce attempt costs exactly one compression
+    tail = len(prefix) % 64
+    if tail > 64 - 8 - 9:
+        prefix += bytes(64 - tail)
+    return prefix
+
+
+def iter_records(buffer):
+    # walk the records of a saved chain in a bytes-like buffer (e.g. an mmap), yielding
+    # (blknum, timestamp, nonce, hash, prevash, info_bytes) without building Block objects
+    offset = 0
+    while offset < len(buffer):
+        blknum, timestamp, nonce, block_hash, prevash, info_len = RECORD.unpack_from(buffer, offset)
+        offset += RECORD.size
+        yield blknum, timestamp, nonce, block_hash, prevash, buffer[offset:offset + info_len]
+        offset += info_len
+
+
+def validate_mmap(buffer):
+    # validate a saved chain straight from its bytes: the same checks as Blockchain.is_chain_valid(force=True),
+    # but scanning flat records in order instead of traversing Python objects
+    previous_hash = None
+    try:
+        for index, (blknum, timestamp, nonce, block_hash, prevash, info_bytes) in enumerate(iter_records(buffer)):
+            # index 0 is genesis and is not rehashed, matching is_chain_valid()
+            if index > 0:
+                recomputed = sha256(block_prefix(blknum, timestamp, info_bytes, prevash))
+                recomputed.update(nonce.to_bytes(8, "big"))
+                if block_hash != recomputed.digest() or prevash != previous_hash:
+                    return False
+            previous_hash = block_hash
+    except struct.error:
+        # a truncated record means the file is damaged
+        return False
+    return True
+
+
+def search_nonce(prefix, difficulty, start=0, stride=1, attempts=None):
+    # proof-of-work kernel: find the first nonce in start, start+stride, start+2*stride, ... whose SHA-256(prefix + nonce)
+    # has `difficulty` leading zero hex digits; works only on bytes and ints (no Block object), so the hot loop touches local variables only
+    # returns (nonce, raw digest), or None when `attempts` nonces were tried without success (attempts=None searches until found)
+    # a digest meets the target when its top 4*difficulty bits are zero, i.e. when as a 256-bit big-endian integer it is below
+    # 2**(256 - 4*difficulty); equal-length bytes compare like big-endian integers, so each attempt is one bytes comparison
+    # (a single memcmp over machine words) with no hex encoding, slicing or int conversion; difficulty 0 accepts any digest
+    if difficulty:
+        limit = (1 << (256 - 4 * difficulty)).to_bytes(32, "big")
+    else:
+        limit = b"\xff" * 33
+    # absorb the fixed prefix into a SHA-256 state once; every attempt copies this midstate instead of rehashing the prefix
+    base = sha256(prefix)
+    # bind the per-window lookups to locals once; local loads are cheaper than attribute and global lookups in the loops below
+    base_copy = base.copy
+    low_bytes = NONCE_LOW_BYTES
+    # first nonce past the end of a bounded search (None for an unbounded one)
+    end = None if attempts is None else start + attempts * stride
+    nonce = start
+
+    # the nonce is fed as 8 big-endian bytes; its top 7 bytes only change every 256 nonces, so they are absorbed into a second
+    # midstate once per window and each attempt feeds just the final byte from NONCE_LOW_BYTES (no int-to-bytes per attempt)
+    while end is None or nonce < end:
+        high = nonce >> 8
+        # this window holds nonces high*256 .. high*256+255, cut short at the end of a bounded search
+        window_end = (high + 1) << 8
+        if end is not None and end < window_end:
+            window_end = end
+        window = base_copy()
+        window.update(high.to_bytes(7, "big"))
+        copy = window.copy
+
+        # each iteration hashes one nonce and tests the raw digest; this is the core proof-of-work routine
+        lows = low_bytes[nonce & 0xFF:window_end - (high << 8):stride]
+        for low in lows:
+            attempt = copy()
+            attempt.update(low)
+            digest = attempt.digest()
+            if digest < limit:
+                return (high << 8) | low[0], digest
+        # step to the first nonce of this worker's sequence in the next window
+        nonce += len(lows) * stride
+    return None
+
+
+def _mine_worker(prefix, difficulty, start, stride, stop_event):
+    # body of one mining process: search this worker's nonce stride in batches, checking between batches whether another worker has won
+    while not stop_event.is_set():
+        result = search_nonce(prefix, difficulty, start, stride, WORKER_BATCH)
+        if result is not None:
+            # tell the other workers to stop at the end of their current batch
+            stop_event.set()
+            return result
+        # move this worker to its next batch of nonces
+        start += WORKER_BATCH * stride
+    return None
 
 
 class Block:  # define a Block class to represent a single blockchain block; class definition executes at import time
+    # fixed attribute layout instead of a per-instance __dict__: smaller blocks and faster attribute access on long chains
+    __slots__ = ("blknum", "timestamp", "info", "prevash", "minework", "_cached_hash", "_verified_hash")
+
     def __init__(self, blknum, info, prevash):
         # store the block number provided when the Block instance is created; runs whenever a Block is instantiated
         self.blknum = blknum
-        # record the creation timestamp as an ISO-like string; evaluated at Block instantiation to capture creation time
-        self.timestamp = str(datetime.datetime.now())
+        # record the creation timestamp as integer nanoseconds since the epoch; evaluated at Block instantiation to capture creation time
+        self.timestamp = time.time_ns()
         # store the payload/transaction information for this block; set at instantiation
         self.info = info
-        # store the hash of the previous block in the chain; provided when adding/creating a block so continuity can be validated
+        # store the previous block's hash as 32 raw bytes; provided when adding/creating a block so continuity can be validated
         self.prevash = prevash
         # initialize the nonce / mining work counter; starts at 0 when the block object is created and is incremented during mining
         self.minework = 0
-        # compute the initial hash based on the current fields (including minework=0); this runs at instantiation to have a starting hash value
-        self.hash = self.calculate_hash()
-
-    def calculate_hash(self):
-        # create a deterministic JSON string of the block's critical fields; runs whenever we need the canonical representation for hashing
-        block_creation_string = json.dumps({
-            "blocknumber": self.blknum,
-            "timestamp": self.timestamp,
-            "info": self.info,
-            "prevash": self.prevash,
-            "minework": self.minework
-        }, sort_keys=True)
-        # compute and return the SHA-256 hex digest of the canonical string; this is the block's cryptographic fingerprint used for validation
-        return hashlib.sha256(block_creation_string.encode()).hexdigest()
-
-    def mine_the_block(self, difficulty):
-        # target is a string of leading zeros of length == difficulty; this defines the mining goal and is evaluated when mining is invoked
-        target = "0" * difficulty
-
-        # loop until the block's hash has the required number of leading zeros
-        # each iteration updates the nonce (minework) and recalculates the hash; this is the core proof-of-work routine
-        while self.hash[:difficulty] != target:
-            # increment the nonce so the next hash attempt differs; runs many times during mining
-            self.minework += 1
-            # recalculate the hash with the updated nonce; runs immediately after incrementing the nonce
-            self.hash = self.calculate_hash()
-
-        # when the loop exits the hash meets the difficulty target; print a confirmation message; useful for demonstration and debugging
+        # the block's raw 32-byte digest, computed lazily on first access of hash_bytes/hash and then kept until mining replaces it
+        self._cached_hash = None
+        # the hash this block was last proven to have (set by mining or a full validation); None until then
+        self._verified_hash = None
+
+    def _serialize(self):
+        # build the canonical bytes of every field except the nonce; the nonce is appended after this prefix when hashing
+        # so mining can hash the prefix once and only feed the changing nonce on each attempt
+        # fixed layout: blknum (8 bytes) | timestamp (8 bytes) | len(info) (4 bytes) | info as sorted-key JSON | prevash (32 raw bytes)
+        return block_prefix(self.blknum, self.timestamp, json.dumps(self.info, sort_keys=True).encode(), self.prevash)
+
+    @property
+    def hash_bytes(self):
+        # the raw 32-byte digest used for linking and validation; computed from the current fields the first time it is read,
+        # then returned from the cache so validation and linking never rehash a block just to read its stored hash
+        if self._cached_hash is None:
+            self._cached_hash = self.calculate_hash_bytes()
+        return self._cached_hash
+
+    @hash_bytes.setter
+    def hash_bytes(self, digest):
+        # store a digest directly (mining results, loaded blocks, or a deliberate tamper in experiments)
+        self._cached_hash = digest
+
+    @property
+    def hash(self):
+        # hex form of hash_bytes for display and comparison with calculate_hash()
+        return self.hash_bytes.hex()
+
+    @hash.setter
+    def hash(self, hex_digest):
+        self._cached_hash = bytes.fromhex(hex_digest)
+
+    def calculate_hash_bytes(self, nonce=None):
+        # hash the canonical prefix followed by the nonce (the block's own minework unless another nonce is given);
+        # runs whenever we need the block's fingerprint (creation and validation)
+        if nonce is None:
+            nonce = self.minework
+        block_hash = sha256(self._serialize())
+        block_hash.update(nonce.to_bytes(8, "big"))
+        # return the raw 32-byte SHA-256 digest; this is the block's cryptographic fingerprint used for validation
+        return block_hash.digest()
+
+    def calculate_hash(self, nonce=None):
+        # same fingerprint as calculate_hash_bytes(), hex-encoded for display and comparison with Block.hash
+        return self.calculate_hash_bytes(nonce).hex()
+
+    def mine(self, difficulty):
+        # run the nonce search over this block's canonical prefix, starting from the current nonce
+        self._store_solution(*search_nonce(self._serialize(), difficulty, self.minework))
+
+    def mine_parallel(self, difficulty, n_workers=None):
+        # proof-of-work across several processes: worker k tries nonces minework+k, minework+k+n, minework+k+2n, ...
+        # so the workers never repeat each other's attempts; the first worker to find a valid nonce stops the rest
+        if n_workers is None:
+            n_workers = os.cpu_count() or 1
+        # the prefix is computed once here and shipped to every worker as plain bytes
+        prefix = self._serialize()
+
+        with multiprocessing.Manager() as manager, ProcessPoolExecutor(max_workers=n_workers) as pool:
+            stop_event = manager.Event()
+            futures = [
+                pool.submit(_mine_worker, prefix, difficulty, self.minework + worker_id, n_workers, stop_event)
+                for worker_id in range(n_workers)
+            ]
+            # take the first worker that reports a result; workers that were stopped return None
+            for future in as_completed(futures):
+                result = future.result()
+                if result is not None:
+                    break
+
+        self._store_solution(*result)
+
+    async def mine_async(self, difficulty, progress=None, cancel=None):
+        # proof-of-work as a coroutine: search ASYNC_BATCH nonces at a time and yield to the event loop between batches,
+        # so a server or UI sharing the loop keeps responding while the block is mined
+        # progress(hashes, rate) is called after every unsuccessful batch with the attempts so far and the hashes per second;
+        # setting the asyncio.Event `cancel` stops mining at the next batch boundary
+        # returns True once mined; returns False if cancelled, leaving minework at the next untried nonce so mining can resume
+        prefix = self._serialize()
+        started = time.perf_counter()
+        hashes = 0
+
+        while True:
+            result = search_nonce(prefix, difficulty, self.minework, 1, ASYNC_BATCH)
+            if result is not None:
+                self._store_solution(*result)
+                return True
+            self.minework += ASYNC_BATCH
+            # the nonce moved, so any cached hash no longer describes this block
+            self._cached_hash = None
+            hashes += ASYNC_BATCH
+            # let other tasks run before the next batch
+            await asyncio.sleep(0)
+            if progress is not None:
+                progress(hashes, hashes / (time.perf_counter() - started))
+            if cancel is not None and cancel.is_set():
+                return False
+
+    def _store_solution(self, nonce, digest):
+        # record the winning nonce; called once by either mining routine when the search succeeds
+        self.minework = nonce
+        # keep the raw winning digest as the block's hash; hex encoding happens only when hash is displayed
+        self._cached_hash = digest
+        # the digest was computed from the block's current fields, so it is verified as of now; validation can trust it later
+        self._verified_hash = digest
+        # the hash meets the difficulty target; print a confirmation message; useful for demonstration and debugging
         print(f"this block has been mined:{self.hash}")
 
 
@@ -52,10 +305,16 @@ class Blockchain:  # define a Blockchain class to hold the chain and related ope
         self.chain = [self.create_genesis_block()]
         # set the mining difficulty (number of leading zeros required); configured at initialization and used by add_block
         self.difficulty = 4
+        # number of processes add_block mines with; 1 mines in this process, more uses Block.mine_parallel across that many workers
+        self.workers = 1
+        # index of the last block that is_chain_valid() fully rehashed; blocks up to here are not rehashed again unless forced
+        self._last_valid_index = 0
+        # hash of the block that sat at _last_valid_index when it was verified; None until a validation succeeds
+        self._last_valid_hash = None
 
     def create_genesis_block(self):
         # return the first block in the chain with a fixed previous-hash value; called during Blockchain initialization
-        return Block(0, "Block genesis", "0")
+        return Block(0, "Block genesis", b"\x00" * 32)
 
     def get_latest_block(self):
         # return the last block in the chain list; used when linking a new block to the chain; runs when called
@@ -63,28 +322,89 @@ class Blockchain:  # define a Blockchain class to hold the chain and related ope
 
     def add_block(self, new_block):
         # set the incoming block's previous-hash to the hash of the latest block; ensures the chain links together; runs before mining
-        new_block.prevash = self.get_latest_block().hash
+        new_block.prevash = self.get_latest_block().hash_bytes
         # perform proof-of-work on the new block using the blockchain difficulty; this mutates new_block.minework and new_block.hash
-        new_block.mine_the_block(self.difficulty)
+        if self.workers > 1:
+            new_block.mine_parallel(self.difficulty, self.workers)
+        else:
+            new_block.mine(self.difficulty)
         # append the mined block to the chain list; runs after successful mining to include the block in the blockchain
         self.chain.append(new_block)
 
-    def is_chain_valid(self):
-        # iterate over the chain (starting at 1 because 0 is genesis) to validate each block's integrity and linkage
-        for i in range(1, len(self.chain)):
+    def is_chain_valid(self, force=False):
+        # blocks up to _last_valid_index were rehashed by an earlier call, so (unless force=True) they only get cheap checks:
+        # the stored hash must still equal the verified hash and the links must still hold; no hashing is needed for them
+        # that only holds while the verified tip is still in place; if the chain shrank or that slot now holds another block,
+        # forget the earlier result and rehash from the start
+        index = self._last_valid_index
+        if index >= len(self.chain) or self.chain[index].hash_bytes != self._last_valid_hash:
+            self._last_valid_index = 0
+            self._last_valid_hash = None
+        start = 1 if force else self._last_valid_index + 1
+        for i in range(1, start):
+            current = self.chain[i]
+            if current.hash_bytes != current._verified_hash or current.prevash != self.chain[i - 1].hash_bytes:
+                return False
+
+        # iterate over the remaining blocks (index 0 is genesis) to validate each block's integrity and linkage
+        for i in range(start, len(self.chain)):
             # get the current and previous blocks for comparison; executed for every index in the loop
             current = self.chain[i]
             previous = self.chain[i - 1]
             # recompute the current block's hash and compare with stored hash to detect tampering; runs for validation checks
-            if current.hash != current.calculate_hash():
+            if current.hash_bytes != current.calculate_hash_bytes():
                 # if hashes differ, the block's content was modified after mining; validation fails
                 return False
             # verify the stored prevash matches the previous block's hash to ensure linkage; runs for chain continuity validation
-            if current.prevash != previous.hash:
+            if current.prevash != previous.hash_bytes:
                 return False
-        # if all checks pass, the chain is valid
+            # the stored hash has just been recomputed from the block's fields, so later calls can trust it
+            current._verified_hash = current.hash_bytes
+
+        # if all checks pass, the chain is valid; remember how far it has been rehashed so the next call only checks new blocks
+        self._last_valid_index = len(self.chain) - 1
+        self._last_valid_hash = self.chain[-1].hash_bytes if self.chain else None
         return True
 
+    def save(self, path):
+        # write the whole chain as a binary file, replacing any existing one: one fixed-width RECORD per block followed by its info JSON
+        with open(path, "wb") as out:
+            for block in self.chain:
+                info_bytes = json.dumps(block.info, sort_keys=True).encode()
+                out.write(RECORD.pack(
+                    block.blknum, block.timestamp, block.minework, block.hash_bytes, block.prevash, len(info_bytes)
+                ))
+                out.write(info_bytes)
+
+    @classmethod
+    def load(cls, path):
+        # rebuild a Blockchain from a file written by save(); the file is memory-mapped and read record by record
+        # use validate_mmap on the same mapping to check a file without building the chain
+        # raises ValueError("corrupt chain file") for an empty file, a truncated record or an undecodable info payload
+        blockchain = cls()
+        blocks = []
+        with open(path, "rb") as source:
+            # mmap cannot map an empty file, and a saved chain always holds at least the genesis block
+            if os.fstat(source.fileno()).st_size == 0:
+                raise ValueError("corrupt chain file")
+            with mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                try:
+                    for blknum, timestamp, nonce, block_hash, prevash, info_bytes in iter_records(buffer):
+                        block = Block(blknum, json.loads(info_bytes), prevash)
+                        # restore the saved fields; the stored hash is what validation checks them against
+                        block.timestamp = timestamp
+                        block.minework = nonce
+                        block.hash_bytes = block_hash
+                        blocks.append(block)
+                except (struct.error, ValueError) as error:
+                    # a short record header raises struct.error; a cut-off info payload fails JSON or UTF-8 decoding
+                    raise ValueError("corrupt chain file") from error
+        blockchain.chain = blocks
+        # none of the loaded blocks has been rehashed yet, so the first is_chain_valid() call checks them all
+        blockchain._last_valid_index = 0
+        blockchain._last_valid_hash = None
+        return blockchain
+
 
 if __name__ == "__main__":
     # create a Blockchain instance when script is executed directly; this block executes only in direct-run mode
@@ -92,15 +412,15 @@ if __name__ == "__main__":
 
     # mining and adding block 1: print status then create and add the block; these lines run during the script's main sequence
     print("Mining block 1...")
-    Final_Blockchain.add_block(Block(1, {"amount": 100}, ""))
+    Final_Blockchain.add_block(Block(1, {"amount": 100}, b""))
 
     # mining and adding block 2
     print("Mining block 2...")
-    Final_Blockchain.add_block(Block(2, {"amount": 50}, ""))
+    Final_Blockchain.add_block(Block(2, {"amount": 50}, b""))
 
     # mining and adding block 3
     print("mining block 3...")
-    Final_Blockchain.add_block(Block(3, {"amount": 200}, ""))
+    Final_Blockchain.add_block(Block(3, {"amount": 200}, b""))
 
     # print whether the blockchain is valid after adding blocks; validation runs is_chain_valid() which performs integrity checks
     print("\nBlockchain valid? " + str(Final_Blockchain.is_chain_valid()))
@@ -109,7 +429,7 @@ if __name__ == "__main__":
     for block in Final_Blockchain.chain:
         print("\n------------------------------")
         print(f"Block number: {block.blknum}")
-        print(f"Timestamp: {block.timestamp}")
+        print(f"Timestamp: {datetime.datetime.fromtimestamp(block.timestamp / 1e9)}")
         print(f"Info: {block.info}")
         print(f"Hash: {block.hash}")
-        print(f"Previous Hash: {block.prevash}")
\ No newline at end of file
+        print(f"Previous Hash: {block.prevash.hex()}")
\ No newline at end of file